@@ -3,9 +3,9 @@ FastAPI routes for file upload and processing.
 Clean API layer following separation of concerns principle.
 """
 import asyncio
+import logging
 import uuid
 from collections.abc import AsyncIterator
-from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from pathlib import Path
@@ -17,19 +17,21 @@ from fastapi.templating import Jinja2Templates
 
 from core.config import get_settings
 from core.exceptions import FileProcessingError
-from core.logger import setup_logger
+from core.logger import configure_logging
 from core.pg import close_pg_pool, init_pg_pool, init_transaction_logs_table
-from llm.client import close_client
+from llm.client import close_client, reset_client
 from services.transaction_service import TransactionService
 
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
 settings = get_settings()
+configure_logging(settings.log_level)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     """Application lifespan: initialize and clean up resources."""
     # Startup
+    reset_client()
     try:
         await init_pg_pool()
         await init_transaction_logs_table()
@@ -40,6 +42,7 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     yield
     # Shutdown
     await close_pg_pool()
+    transaction_service.close()
     close_client()
 
 
@@ -122,14 +125,10 @@ async def process_files_background(
         incoming_path: Path to incoming transactions file
         outgoing_path: Path to outgoing transactions file
     """
-    executor = ThreadPoolExecutor(max_workers=settings.max_concurrent_llm_calls)
     try:
         jobs[job_id]["status"] = "processing"
         jobs[job_id]["message"] = "Processing incoming and outgoing transactions..."
 
-        # Shared semaphore so both directions compete for the same LLM concurrency budget
-        shared_semaphore = asyncio.Semaphore(settings.max_concurrent_llm_calls)
-
         incoming_orig = _extract_original_filename(incoming_path)
         outgoing_orig = _extract_original_filename(outgoing_path)
 
@@ -138,15 +137,11 @@ async def process_files_background(
                 str(incoming_path), "incoming",
                 job_id=job_id,
                 original_filename=incoming_orig,
-                semaphore=shared_semaphore,
-                executor=executor,
             ),
             transaction_service.process_file(
                 str(outgoing_path), "outgoing",
                 job_id=job_id,
                 original_filename=outgoing_orig,
-                semaphore=shared_semaphore,
-                executor=executor,
             ),
             return_exceptions=True,
         )
@@ -197,7 +192,6 @@ async def process_files_background(
         jobs[job_id]["error"] = str(e)
 
     finally:
-        executor.shutdown(wait=False)
         # Clean up uploaded files
         for path in [incoming_path, outgoing_path]:
             try:
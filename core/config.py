@@ -34,15 +34,24 @@ class Settings(BaseSettings):
     )
     openai_model: str = Field(..., alias="OPENAI_MODEL")
     openai_timeout: int = Field(..., alias="OPENAI_TIMEOUT")
+    openai_prompt_cache: bool = Field(default=True, alias="OPENAI_PROMPT_CACHE")
+    openai_web_search_tool: str = Field(default="web_search", alias="OPENAI_WEB_SEARCH_TOOL")
+    openai_reasoning_effort: str = Field(default="medium", alias="OPENAI_REASONING_EFFORT")
+    openai_max_output_tokens: Optional[int] = Field(default=None, alias="OPENAI_MAX_OUTPUT_TOKENS")
     
     # Processing
     amount_threshold_kzt: float = Field(..., alias="AMOUNT_THRESHOLD_KZT")
     max_concurrent_llm_calls: int = Field(..., alias="MAX_CONCURRENT_LLM_CALLS")
     batch_size: int = Field(default=10, alias="BATCH_SIZE")
+    adaptive_batch_size: bool = Field(default=False, alias="ADAPTIVE_BATCH_SIZE")
+    offshore_fast_path: bool = Field(default=False, alias="OFFSHORE_FAST_PATH")
+    llm_cache_enabled: bool = Field(default=False, alias="LLM_CACHE_ENABLED")
+    llm_cache_ttl_days: int = Field(default=30, alias="LLM_CACHE_TTL_DAYS")
     
     # Storage
     temp_storage_path: str = Field(..., alias="STORAGE_PATH")
     database_path: str = Field(default="offshore.db", alias="DATABASE_PATH")
+    llm_cache_path: str = Field(default="llm_cache.db", alias="LLM_CACHE_PATH")
     
     # PostgreSQL
     postgres_host: str = Field(..., alias="POSTGRES_HOST")
@@ -89,6 +98,41 @@ class Settings(BaseSettings):
             raise ValueError("Max concurrent LLM calls should not exceed 50")
         return v
 
+    @field_validator("openai_web_search_tool")
+    @classmethod
+    def validate_web_search_tool(cls, v: str) -> str:
+        """Validate web search tool is a Responses API web search tool type."""
+        valid_tools = {"web_search", "web_search_preview"}
+        if v not in valid_tools:
+            raise ValueError(f"Web search tool must be one of: {sorted(valid_tools)}")
+        return v
+
+    @field_validator("openai_reasoning_effort")
+    @classmethod
+    def validate_reasoning_effort(cls, v: str) -> str:
+        """Validate reasoning effort is a Responses API effort level."""
+        valid_efforts = {"minimal", "low", "medium", "high"}
+        v_lower = v.lower()
+        if v_lower not in valid_efforts:
+            raise ValueError(f"Reasoning effort must be one of: {sorted(valid_efforts)}")
+        return v_lower
+
+    @field_validator("openai_max_output_tokens")
+    @classmethod
+    def validate_max_output_tokens(cls, v: Optional[int]) -> Optional[int]:
+        """Validate output token cap is positive when set."""
+        if v is not None and v < 1:
+            raise ValueError("Max output tokens must be at least 1")
+        return v
+
+    @field_validator("llm_cache_ttl_days")
+    @classmethod
+    def validate_llm_cache_ttl(cls, v: int) -> int:
+        """Validate classification cache TTL is positive."""
+        if v < 1:
+            raise ValueError("LLM cache TTL must be at least 1 day")
+        return v
+
     @field_validator("batch_size")
     @classmethod
     def validate_batch_size(cls, v: int) -> int:
@@ -1,16 +1,22 @@
 """
 Database module for offshore jurisdiction data storage.
-Provides SQLite-based persistence for country lists.
+Provides SQLite-based persistence for country lists and cached LLM classifications.
+
+The classification cache lives in its own SQLite file so cache writes never
+touch the reference database (its mtime keys the prompt's country list).
 """
+import logging
 import sqlite3
 from contextlib import contextmanager
-from datetime import datetime, timezone
-from typing import Generator, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Generator, List, Optional, Tuple
 
 from core.config import get_settings
-from core.logger import setup_logger
 
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
+
+# Keys per IN (...) lookup, well under SQLite's bound-parameter limit
+CACHE_LOOKUP_CHUNK_SIZE = 500
 
 
 class Database:
@@ -20,16 +26,21 @@ class Database:
         """Initialize database with settings."""
         self.settings = get_settings()
         self.db_path = self.settings.database_path
+        self.cache_path = self.settings.llm_cache_path
+        self._cache_table_ready = False
 
     @contextmanager
-    def get_connection(self) -> Generator[sqlite3.Connection, None, None]:
+    def get_connection(self, db_path: Optional[str] = None) -> Generator[sqlite3.Connection, None, None]:
         """
         Context manager for database connections.
         
+        Args:
+            db_path: Database file to open; defaults to the reference database.
+        
         Yields:
             Database connection with Row factory enabled.
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(db_path or self.db_path)
         conn.row_factory = sqlite3.Row
         try:
             yield conn
@@ -91,6 +102,84 @@ class Database:
                 logger.error(f"Failed to get countries: {e}")
                 return []
 
+    def _ensure_cache_table(self, conn: sqlite3.Connection) -> None:
+        """Create the classification cache table on first use."""
+        if not self._cache_table_ready:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS classification_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    response_json TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            conn.commit()
+            self._cache_table_ready = True
+
+    def get_cached_classifications(self, cache_keys: List[str], max_age_days: int) -> Dict[str, str]:
+        """
+        Get cached LLM classifications younger than max_age_days.
+        
+        One connection and IN (...) lookups serve the whole batch. Cache
+        failures, including failing to open the database, are logged and
+        treated as misses.
+        
+        Args:
+            cache_keys: Hashes of the classification inputs.
+            max_age_days: Maximum entry age in days.
+        
+        Returns:
+            Mapping of cache key to cached response JSON, for hits only.
+        """
+        if not cache_keys:
+            return {}
+        
+        cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+        unique_keys = list(dict.fromkeys(cache_keys))
+        hits: Dict[str, str] = {}
+        try:
+            with self.get_connection(self.cache_path) as conn:
+                self._ensure_cache_table(conn)
+                for start in range(0, len(unique_keys), CACHE_LOOKUP_CHUNK_SIZE):
+                    chunk = unique_keys[start:start + CACHE_LOOKUP_CHUNK_SIZE]
+                    placeholders = ", ".join("?" * len(chunk))
+                    rows = conn.execute(
+                        "SELECT cache_key, response_json FROM classification_cache "
+                        f"WHERE created_at >= ? AND cache_key IN ({placeholders})",
+                        (cutoff.isoformat(timespec="seconds"), *chunk)
+                    ).fetchall()
+                    hits.update((row["cache_key"], row["response_json"]) for row in rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read classification cache: {e}")
+            return {}
+        return hits
+
+    def set_cached_classifications(self, entries: List[Tuple[str, str]]) -> None:
+        """
+        Store LLM classifications in the cache, replacing any older entries.
+        
+        All entries are written with one connection and one commit. Cache
+        failures, including failing to open the database, are logged and
+        never raised.
+        
+        Args:
+            entries: (cache_key, response_json) pairs.
+        """
+        if not entries:
+            return
+        
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        try:
+            with self.get_connection(self.cache_path) as conn:
+                self._ensure_cache_table(conn)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO classification_cache "
+                    "(cache_key, response_json, created_at) VALUES (?, ?, ?)",
+                    [(cache_key, response_json, now) for cache_key, response_json in entries]
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write classification cache: {e}")
+
 
 # Singleton database instance
 _db: Optional[Database] = None
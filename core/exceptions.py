@@ -35,6 +35,11 @@ class LLMError(OffshoreRiskException):
     pass
 
 
+class LLMTransientError(LLMError):
+    """Raised when LLM API call fails with a retryable error (timeout, 429, 5xx)."""
+    pass
+
+
 class ParsingError(OffshoreRiskException):
     """Raised when Excel parsing fails."""
     pass
@@ -2,20 +2,29 @@
 Excel exporters that preserve original columns and add Результат column.
 Handles both incoming and outgoing transaction outputs.
 """
-from datetime import datetime
+import logging
+import math
+from datetime import date, datetime
 from pathlib import Path
-from typing import List
+from typing import Any, List
 
 import pandas as pd
 
 from core.config import get_settings
 from core.exceptions import ExportError
-from core.logger import setup_logger
 from core.schema import LABEL_TRANSLATIONS, OffshoreRiskResponse
 
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Result sets above this many rows are written with xlsxwriter's constant_memory mode
+STREAMING_EXPORT_MIN_ROWS = 1000
+
+# Same cell formats pandas applies in DataFrame.to_excel
+HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+DATETIME_NUM_FORMAT = "YYYY-MM-DD HH:MM:SS"
+DATE_NUM_FORMAT = "YYYY-MM-DD"
+
 
 def format_result_column(response: OffshoreRiskResponse) -> str:
     """
@@ -67,7 +76,8 @@ def export_to_excel(
     original_df: pd.DataFrame,
     responses: List[OffshoreRiskResponse],
     output_path: str,
-    sheet_name: str
+    sheet_name: str,
+    streaming: bool = False
 ) -> str:
     """
     Export processed transactions to Excel with Результат column.
@@ -78,6 +88,8 @@ def export_to_excel(
         responses: List of LLM responses (same length as df)
         output_path: Output file path
         sheet_name: Sheet name (e.g., "Входящие операции")
+        streaming: Write rows in xlsxwriter constant_memory mode, flushing each
+            row to disk instead of holding the whole cell grid (large files)
     
     Returns:
         Path to created file
@@ -106,33 +118,19 @@ def export_to_excel(
     
     # Write to Excel
     try:
-        with pd.ExcelWriter(output_path, engine="xlsxwriter") as writer:
-            output_df.to_excel(writer, sheet_name=sheet_name, index=False)
-            
-            # Get workbook and worksheet for formatting
+        engine_kwargs = {"options": {"constant_memory": True}} if streaming else None
+        with pd.ExcelWriter(output_path, engine="xlsxwriter", engine_kwargs=engine_kwargs) as writer:
             workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
-            
-            # Format BIN/ИИН columns as text to preserve leading zeros
-            text_format = workbook.add_format({"num_format": "@"})  # @ = text format
-            bin_columns = ["ИИН/БИН бенефициара", "БИН плательщика"]
-            for idx, col in enumerate(output_df.columns):
-                if col in bin_columns:
-                    worksheet.set_column(idx, idx, 15, text_format)
-            
-            # Format Результат column to wrap text
-            wrap_format = workbook.add_format({"text_wrap": True, "valign": "top"})
-            result_col_idx = len(output_df.columns) - 1  # Last column
-            worksheet.set_column(result_col_idx, result_col_idx, 80, wrap_format)
-            
-            # Auto-fit other columns (approximate)
-            for idx, col in enumerate(output_df.columns[:-1]):  # Exclude last (Результат)
-                if col not in bin_columns:  # Skip BIN columns (already formatted)
-                    col_max = output_df[col].astype(str).map(len).max()
-                    if pd.isna(col_max):
-                        col_max = 0
-                    max_len = max(int(col_max), len(str(col)))
-                    worksheet.set_column(idx, idx, min(max_len + 2, 50))
+            if streaming:
+                # constant_memory flushes each row as it is written, and cells
+                # only pick up column formats that exist at that point
+                worksheet = workbook.add_worksheet(sheet_name)
+                _format_columns(workbook, worksheet, output_df)
+                _write_rows(workbook, worksheet, output_df)
+            else:
+                output_df.to_excel(writer, sheet_name=sheet_name, index=False)
+                worksheet = writer.sheets[sheet_name]
+                _format_columns(workbook, worksheet, output_df)
         
         logger.info(f"Successfully exported to {output_path}")
         return output_path
@@ -147,6 +145,73 @@ def export_to_excel(
         )
 
 
+def _format_columns(workbook: Any, worksheet: Any, output_df: pd.DataFrame) -> None:
+    """
+    Apply column widths and formats (BIN as text, wrapped Результат).
+    
+    Args:
+        workbook: xlsxwriter Workbook
+        worksheet: Worksheet being written
+        output_df: Output DataFrame, Результат as the last column
+    """
+    # Format BIN/ИИН columns as text to preserve leading zeros
+    text_format = workbook.add_format({"num_format": "@"})  # @ = text format
+    bin_columns = ["ИИН/БИН бенефициара", "БИН плательщика"]
+    for idx, col in enumerate(output_df.columns):
+        if col in bin_columns:
+            worksheet.set_column(idx, idx, 15, text_format)
+    
+    # Format Результат column to wrap text
+    wrap_format = workbook.add_format({"text_wrap": True, "valign": "top"})
+    result_col_idx = len(output_df.columns) - 1  # Last column
+    worksheet.set_column(result_col_idx, result_col_idx, 80, wrap_format)
+    
+    # Auto-fit other columns (approximate)
+    for idx, col in enumerate(output_df.columns[:-1]):  # Exclude last (Результат)
+        if col not in bin_columns:  # Skip BIN columns (already formatted)
+            col_max = output_df[col].astype(str).map(len).max()
+            if pd.isna(col_max):
+                col_max = 0
+            max_len = max(int(col_max), len(str(col)))
+            worksheet.set_column(idx, idx, min(max_len + 2, 50))
+
+
+def _write_rows(workbook: Any, worksheet: Any, df: pd.DataFrame) -> None:
+    """
+    Write a DataFrame row by row, as DataFrame.to_excel(index=False) would.
+    
+    constant_memory mode only keeps the current row in memory, so cells must
+    be written in row order; to_excel writes column by column. Column
+    formats must already be set on the worksheet.
+    
+    Args:
+        workbook: xlsxwriter Workbook
+        worksheet: Worksheet to write into
+        df: DataFrame to write (header row + values)
+    """
+    header_format = workbook.add_format(HEADER_FORMAT)
+    datetime_format = workbook.add_format({"num_format": DATETIME_NUM_FORMAT})
+    date_format = workbook.add_format({"num_format": DATE_NUM_FORMAT})
+    
+    for col_idx, col in enumerate(df.columns):
+        worksheet.write(0, col_idx, col, header_format)
+    
+    # object arrays yield plain Python ints/floats and Timestamps for datetimes
+    columns = [df[col].to_numpy(dtype=object) for col in df.columns]
+    for row_idx, values in enumerate(zip(*columns), start=1):
+        for col_idx, value in enumerate(values):
+            if pd.isna(value):
+                continue
+            if isinstance(value, datetime):
+                worksheet.write_datetime(row_idx, col_idx, value, datetime_format)
+            elif isinstance(value, date):
+                worksheet.write_datetime(row_idx, col_idx, value, date_format)
+            elif isinstance(value, float) and math.isinf(value):
+                worksheet.write_string(row_idx, col_idx, "inf" if value > 0 else "-inf")
+            else:
+                worksheet.write(row_idx, col_idx, value)
+
+
 def create_output_filename(direction: str, base_path: str = None) -> str:
     """
     Create timestamped output filename.
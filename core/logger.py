@@ -1,39 +1,38 @@
 """
 Structured logging configuration for offshore risk detection.
 Ensures PII redaction and proper log levels.
+
+Modules create loggers with ``logging.getLogger(__name__)``; a single
+stdout handler is installed on the root logger by ``configure_logging``.
 """
 import logging
 import os
 import sys
 from typing import Optional
 
+LOG_FORMAT = "%(asctime)s | %(name)s | %(levelname)s | %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_handler: Optional[logging.Handler] = None
 
-def setup_logger(name: str, level: Optional[str] = None) -> logging.Logger:
+
+def configure_logging(level: Optional[str] = None) -> None:
     """
-    Configure and return a logger instance.
-    
+    Install the shared stdout handler on the root logger and set the level.
+
+    Safe to call more than once: the handler is added only on the first call,
+    later calls just update the level.
+
     Args:
-        name: Logger name (usually __name__)
         level: Log level (DEBUG, INFO, WARNING, ERROR). Defaults to env LOG_LEVEL or INFO.
-    
-    Returns:
-        Configured logger instance
     """
-    log_level = level or os.getenv("LOG_LEVEL", "INFO")
-    
-    new_logger = logging.getLogger(name)
-    new_logger.setLevel(getattr(logging, log_level.upper()))
-    
-    # Avoid duplicate handlers
-    if not new_logger.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(getattr(logging, log_level.upper()))
-        
-        formatter = logging.Formatter(
-            fmt="%(asctime)s | %(name)s | %(levelname)s | %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S"
-        )
-        handler.setFormatter(formatter)
-        new_logger.addHandler(handler)
-    
-    return new_logger
+    global _handler
+    log_level = getattr(logging, (level or os.getenv("LOG_LEVEL", "INFO")).upper())
+
+    root_logger = logging.getLogger()
+    if _handler is None:
+        _handler = logging.StreamHandler(sys.stdout)
+        _handler.setFormatter(logging.Formatter(fmt=LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+        root_logger.addHandler(_handler)
+
+    root_logger.setLevel(log_level)
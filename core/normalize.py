@@ -2,18 +2,21 @@
 Data normalization and metadata enrichment.
 Handles currency conversion, amount cleaning, and transaction metadata.
 """
+import logging
 import re
-from typing import Any, Dict, Optional
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 
 import pandas as pd
 
 from core.config import get_settings
 from core.exceptions import ValidationError
-from core.logger import setup_logger
 
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Outgoing payment statuses (lowercased) that are excluded from processing
+EXCLUDED_PAYMENT_STATUSES: FrozenSet[str] = frozenset({"отказано в исполнении", "удален"})
+
 
 def clean_amount_kzt(value: Any) -> Optional[float]:
     """
@@ -56,6 +59,33 @@ def clean_amount_kzt(value: Any) -> Optional[float]:
         return None
 
 
+def clean_amount_column(values: pd.Series) -> pd.Series:
+    """
+    Vectorized clean_amount_kzt over a whole column.
+    
+    Numeric columns are used as is; text columns get the same cleanup as
+    clean_amount_kzt (strip everything but digits, '.' and '-') in one pass.
+    
+    Args:
+        values: Raw amount column
+    
+    Returns:
+        Float Series of absolute amounts, NaN where the value is missing or invalid
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.astype(float).abs()
+    
+    text = values.astype(str)
+    present = values.notna() & text.str.strip().ne("")
+    cleaned = text.str.replace(r"[^\d.\-]", "", regex=True)
+    amounts = pd.to_numeric(cleaned.where(present), errors="coerce").abs()
+    
+    invalid_count = int((amounts.isna() & present).sum())
+    if invalid_count:
+        logger.warning(f"Failed to parse {invalid_count} amount value(s); treating them as missing")
+    return amounts
+
+
 def filter_by_threshold(df: pd.DataFrame, threshold: Optional[float] = None) -> pd.DataFrame:
     """
     Filter transactions by KZT amount threshold.
@@ -81,14 +111,14 @@ def filter_by_threshold(df: pd.DataFrame, threshold: Optional[float] = None) ->
         threshold = settings.amount_threshold_kzt
     
     # Calculate normalized amounts temporarily
-    amounts = df["Сумма в тенге"].apply(clean_amount_kzt)
+    amounts = clean_amount_column(df["Сумма в тенге"])
     
     # Count before filtering
     before_count = len(df)
     
     # Filter by threshold using boolean indexing
-    # mask is True where amount is valid AND >= threshold
-    mask = amounts.notna() & (amounts >= threshold)
+    # mask is True where amount is valid AND >= threshold (NaN compares False)
+    mask = amounts >= threshold
     
     df_filtered = df[mask].copy()
     after_count = len(df_filtered)
@@ -122,14 +152,15 @@ def filter_by_payment_status(df: pd.DataFrame) -> pd.DataFrame:
         )
         return df
 
-    excluded_statuses = {"отказано в исполнении", "удален"}
-
     before_count = len(df)
 
-    normalized_status = df[column_name].apply(
-        lambda v: str(v).strip().lower() if pd.notna(v) else ""
-    )
-    mask = ~normalized_status.isin(excluded_statuses)
+    # Normalize each distinct raw status once; statuses repeat heavily across rows
+    statuses = df[column_name]
+    excluded = [
+        status for status in statuses.dropna().unique()
+        if str(status).strip().lower() in EXCLUDED_PAYMENT_STATUSES
+    ]
+    mask = ~statuses.isin(excluded)
 
     df_filtered = df[mask].copy()
     after_count = len(df_filtered)
@@ -159,6 +190,75 @@ def safe_get_string(row: pd.Series, key: str, default: str = "") -> str:
     return str(value)
 
 
+# Source column of the transaction ID, per direction
+ID_COLUMNS: Dict[str, str] = {
+    "incoming": "№п/п",
+    "outgoing": "№ п/п",
+}
+
+# Normalized string field -> source column, per direction, in output key order.
+# Shared by normalize_transaction (single row) and normalize_dataframe (bulk).
+STRING_FIELD_COLUMNS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "incoming": (
+        ("currency", "Валюта платежа"),
+        ("value_date", "Дата валютирования"),
+        ("acceptance_date", "Дата документа"),
+        ("country_residence", "Страна резидентства бенефициара"),
+        ("citizenship", "Гражданство"),
+        ("city", "Город банка плательщика"),
+        ("country_code", "Код страны банка плательщика"),
+        ("status", "Состояние"),
+        ("beneficiary_name", "Наименование бенефициара (наш клиент)"),
+        ("beneficiary_account", "Номер счета бенефициара"),
+        ("beneficiary_address", "Адрес бенефициара"),
+        ("beneficiary_bank_swift", "SWIFT код Банка бенефициара"),
+        ("beneficiary_correspondent_swift", "SWIFT код кор.банка бенефициара (Отправитель сообщения)"),
+        ("payer", "Плательщик (Наименование)"),
+        ("payer_address", "Адрес плательщика"),
+        ("payer_country", "Страна резиденства плательщика"),
+        ("payer_bank", "Наименование Банка плательщика"),
+        ("payer_bank_swift", "SWIFT код Банка плательщика"),
+        ("payer_bank_address", "Адрес банка плательщика"),
+        ("bank_country", "Страна банка плательщика"),
+        ("payer_correspondent_swift", "SWIFT код Корреспондента Банка Плательщика(отправителя)"),
+        ("payer_correspondent_name", "Наименование Корреспондента Банка Плательщика(отправителя)"),
+        ("payer_correspondent_address", "Адрес Корреспондента Банка Плательщика(отправителя)"),
+        ("intermediary_bank_1", "Банк-посредник отправителя 1"),
+        ("intermediary_bank_2", "Банк-посредник отправителя 2"),
+        ("intermediary_bank_3", "Банк-посредник отправителя 3"),
+        ("payment_details", "Назначение платежа"),
+        ("client_category", "Категория клиента"),
+        # Actual payer/recipient address fields (beneficial owners)
+        ("actual_payer_address", "Адрес фактического плательщика"),
+        ("actual_payer_residence_country", "Страна резиденства фактического плательщика"),
+        ("actual_recipient_address", "Адрес фактического получателя"),
+        ("swift_code", "SWIFT код Банка плательщика"),
+    ),
+    "outgoing": (
+        ("currency", "Валюта платежа"),
+        ("value_date", "Дата валютирования"),
+        ("acceptance_date", "Дата приема"),
+        ("country_residence", "Страна резидентства плательщика"),
+        ("citizenship", "Гражданство"),
+        ("city", "Город банка"),
+        ("country_code", "Код страны получателя"),
+        ("status", "Состояние платежа"),
+        ("payer_name", "Наименование плательщика (наш клиент)"),
+        ("payer_account", "Номер счета плательщика"),
+        ("recipient", "Получатель"),
+        ("recipient_address", "Адрес получателя"),
+        ("recipient_bank", "Наименование Банка получателя"),
+        ("recipient_bank_swift", "SWIFT Банка получателя"),
+        ("recipient_bank_address", "Адрес банка получателя"),
+        ("bank_country", "Страна банка"),
+        ("payment_details", "Назначение платежа"),
+        ("client_category", "Категория клиента"),
+        ("recipient_country", "Страна получателя"),
+        ("swift_code", "SWIFT Банка получателя"),
+    ),
+}
+
+
 def normalize_transaction(row: pd.Series, direction: str) -> Dict[str, Any]:
     """
     Normalize a single transaction row to a standard dictionary format.
@@ -171,68 +271,63 @@ def normalize_transaction(row: pd.Series, direction: str) -> Dict[str, Any]:
     Returns:
         Normalized transaction dictionary
     """
-    # Re-calculate amount for the dict (cheap operation)
-    amount_kzt = clean_amount_kzt(row.get("Сумма в тенге")) or 0.0
-    
-    # Common fields
     normalized = {
-        "id": safe_get_string(row, "№ п/п" if direction == "outgoing" else "№п/п", "unknown"),
+        "id": safe_get_string(row, ID_COLUMNS.get(direction, ID_COLUMNS["incoming"]), "unknown"),
         "direction": direction,
-        "amount_kzt": amount_kzt,
+        # Re-calculate amount for the dict (cheap operation)
+        "amount_kzt": clean_amount_kzt(row.get("Сумма в тенге")) or 0.0,
         "amount": safe_get_value(row, "Сумма"),
-        "currency": safe_get_string(row, "Валюта платежа"),
-        "value_date": safe_get_string(row, "Дата валютирования"),
-        "acceptance_date": safe_get_string(row, "Дата документа" if direction == "incoming" else "Дата приема"),
-        "country_residence": safe_get_string(row, "Страна резидентства бенефициара" if direction == "incoming" else "Страна резидентства плательщика"),
-        "citizenship": safe_get_string(row, "Гражданство"),
-        "city": safe_get_string(row, "Город банка плательщика" if direction == "incoming" else "Город банка"),
-        "country_code": safe_get_string(row, "Код страны банка плательщика" if direction == "incoming" else "Код страны получателя"),
-        "status": safe_get_string(row, "Состояние" if direction == "incoming" else "Состояние платежа"),
     }
-    
-    # Direction-specific fields
-    if direction == "incoming":
-        normalized.update({
-            "beneficiary_name": safe_get_string(row, "Наименование бенефициара (наш клиент)"),
-            "beneficiary_account": safe_get_string(row, "Номер счета бенефициара"),
-            "beneficiary_address": safe_get_string(row, "Адрес бенефициара"),
-            "beneficiary_bank_swift": safe_get_string(row, "SWIFT код Банка бенефициара"),
-            "beneficiary_correspondent_swift": safe_get_string(row, "SWIFT код кор.банка бенефициара (Отправитель сообщения)"),
-            "payer": safe_get_string(row, "Плательщик (Наименование)"),
-            "payer_address": safe_get_string(row, "Адрес плательщика"),
-            "payer_country": safe_get_string(row, "Страна резиденства плательщика"),
-            "payer_bank": safe_get_string(row, "Наименование Банка плательщика"),
-            "payer_bank_swift": safe_get_string(row, "SWIFT код Банка плательщика"),
-            "payer_bank_address": safe_get_string(row, "Адрес банка плательщика"),
-            "bank_country": safe_get_string(row, "Страна банка плательщика"),
-            "payer_correspondent_swift": safe_get_string(row, "SWIFT код Корреспондента Банка Плательщика(отправителя)"),
-            "payer_correspondent_name": safe_get_string(row, "Наименование Корреспондента Банка Плательщика(отправителя)"),
-            "payer_correspondent_address": safe_get_string(row, "Адрес Корреспондента Банка Плательщика(отправителя)"),
-            "intermediary_bank_1": safe_get_string(row, "Банк-посредник отправителя 1"),
-            "intermediary_bank_2": safe_get_string(row, "Банк-посредник отправителя 2"),
-            "intermediary_bank_3": safe_get_string(row, "Банк-посредник отправителя 3"),
-            "payment_details": safe_get_string(row, "Назначение платежа"),
-            "client_category": safe_get_string(row, "Категория клиента"),
-            # Actual payer/recipient address fields (beneficial owners)
-            "actual_payer_address": safe_get_string(row, "Адрес фактического плательщика"),
-            "actual_payer_residence_country": safe_get_string(row, "Страна резиденства фактического плательщика"),
-            "actual_recipient_address": safe_get_string(row, "Адрес фактического получателя"),
-        })
-        normalized["swift_code"] = safe_get_string(row, "SWIFT код Банка плательщика")
-    else:  # outgoing
-        normalized.update({
-            "payer_name": safe_get_string(row, "Наименование плательщика (наш клиент)"),
-            "payer_account": safe_get_string(row, "Номер счета плательщика"),
-            "recipient": safe_get_string(row, "Получатель"),
-            "recipient_address": safe_get_string(row, "Адрес получателя"),
-            "recipient_bank": safe_get_string(row, "Наименование Банка получателя"),
-            "recipient_bank_swift": safe_get_string(row, "SWIFT Банка получателя"),
-            "recipient_bank_address": safe_get_string(row, "Адрес банка получателя"),
-            "bank_country": safe_get_string(row, "Страна банка"),
-            "payment_details": safe_get_string(row, "Назначение платежа"),
-            "client_category": safe_get_string(row, "Категория клиента"),
-            "recipient_country": safe_get_string(row, "Страна получателя")
-        })
-        normalized["swift_code"] = safe_get_string(row, "SWIFT Банка получателя")
+    for key, column in STRING_FIELD_COLUMNS.get(direction, STRING_FIELD_COLUMNS["outgoing"]):
+        normalized[key] = safe_get_string(row, column)
     
     return normalized
+
+
+def normalize_dataframe(df: pd.DataFrame, direction: str) -> List[Dict[str, Any]]:
+    """
+    Normalize all transaction rows of a DataFrame.
+    
+    Produces the same dictionaries as calling normalize_transaction on each
+    row, but reads every column once as an array instead of building a
+    pandas Series per row.
+    
+    Args:
+        df: Filtered transactions DataFrame
+        direction: Transaction direction ("incoming" or "outgoing")
+    
+    Returns:
+        List of normalized transaction dictionaries, in DataFrame order
+    """
+    string_columns = STRING_FIELD_COLUMNS.get(direction, STRING_FIELD_COLUMNS["outgoing"])
+    keys = ["id", "direction", "amount_kzt", "amount", *(key for key, _ in string_columns)]
+    
+    if "Сумма в тенге" in df.columns:
+        amounts_kzt = clean_amount_column(df["Сумма в тенге"]).fillna(0.0).tolist()
+    else:
+        amounts_kzt = [0.0] * len(df)
+    columns = [
+        _string_column(df, ID_COLUMNS.get(direction, ID_COLUMNS["incoming"]), "unknown"),
+        [direction] * len(df),
+        amounts_kzt,
+        _column_values(df, "Сумма"),
+        *(_string_column(df, column) for _, column in string_columns),
+    ]
+    
+    return [dict(zip(keys, values)) for values in zip(*columns)]
+
+
+def _column_values(df: pd.DataFrame, column: str) -> List[Any]:
+    """Column values with missing cells (or a missing column) as None."""
+    if column not in df.columns:
+        return [None] * len(df)
+    values = df[column].to_numpy(dtype=object)
+    return [None if missing else value for value, missing in zip(values, pd.isna(values))]
+
+
+def _string_column(df: pd.DataFrame, column: str, default: str = "") -> List[str]:
+    """Column values as strings, same rules as safe_get_string."""
+    return [
+        default if value is None or value == "" else str(value)
+        for value in _column_values(df, column)
+    ]
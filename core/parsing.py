@@ -2,19 +2,19 @@
 Excel file parsing with Cyrillic header support.
 Handles both incoming and outgoing transaction formats.
 """
+import logging
 import re
 from pathlib import Path
-from typing import Any, Dict, Literal, Set
+from typing import Any, Dict, FrozenSet, Literal
 
 import pandas as pd
 
 from core.exceptions import DataNotFoundError, ParsingError
-from core.logger import setup_logger
 
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
 
 # Expected columns for incoming transactions (Cyrillic headers)
-INCOMING_COLUMNS: Set[str] = {
+INCOMING_COLUMNS: FrozenSet[str] = frozenset({
     "№п/п",
     "Наименование бенефициара (наш клиент)",
     "ИИН/БИН бенефициара",
@@ -57,10 +57,10 @@ INCOMING_COLUMNS: Set[str] = {
     "Страна резиденства фактического плательщика",
     "Фактический плательщик (наименование)",
     "Фактический получатель",
-}
+})
 
 # Expected columns for outgoing transactions (Cyrillic headers)
-OUTGOING_COLUMNS: Set[str] = {
+OUTGOING_COLUMNS: FrozenSet[str] = frozenset({
     "№ п/п",
     "Тип документа",
     "Наименование плательщика (наш клиент)",
@@ -88,7 +88,7 @@ OUTGOING_COLUMNS: Set[str] = {
     "Состояние платежа",
     "Референс платежа",
     "Статус платежа",
-}
+})
 
 
 def parse_excel_file(
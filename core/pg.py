@@ -4,14 +4,14 @@ PostgreSQL connection pool manager using asyncpg.
 Provides a singleton connection pool for transaction logging
 to the compliance database.
 """
+import logging
 from typing import Optional
 
 import asyncpg
 
 from core.config import get_settings
-from core.logger import setup_logger
 
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
 
 _pool: Optional[asyncpg.Pool] = None
 
@@ -7,15 +7,15 @@ transaction_logs table in the compliance database.
 Failures are caught and logged — they never break the processing pipeline.
 """
 import json
+import logging
 from typing import Any, Dict, List, Optional
 
 import asyncpg
 
 from core.exporters import format_result_column
-from core.logger import setup_logger
 from core.schema import OffshoreRiskResponse
 
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
 
 
 def _serialize_transaction(txn: Dict[str, Any]) -> str:
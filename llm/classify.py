@@ -2,31 +2,200 @@
 Transaction classification using LLM with structured output.
 Handles batch transaction LLM calls with error handling.
 """
-from typing import Any, Dict, List
+import hashlib
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
 from pydantic import ValidationError
 
+from core.config import get_settings
+from core.db import get_db
 from core.exceptions import LLMError
-from core.logger import setup_logger
 from core.schema import BatchOffshoreRiskResponse, Classification, OffshoreRiskResponse
 from llm.client import RESPONSE_SCHEMA, get_client
-from llm.prompts import build_system_prompt, build_user_message
+from llm.prompts import (
+    AUTO_OFFSHORE_ENTITIES,
+    build_system_prompt,
+    build_transaction_block,
+    build_user_message,
+    system_prompt_cache_key,
+)
 
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
+settings = get_settings()
 
 # Maximum retries for validation errors (malformed LLM responses)
 MAX_VALIDATION_RETRIES = 3
 
+# Fields filled from local transaction data, not stored in the classification cache
+CACHE_EXCLUDED_FIELDS = {"transaction_id", "direction", "amount_kzt", "llm_error"}
+
+# Bank and counterparty fields checked against the auto-offshore entity list
+AUTO_OFFSHORE_FIELDS = (
+    "payer",
+    "payer_bank",
+    "payer_correspondent_name",
+    "intermediary_bank_1",
+    "intermediary_bank_2",
+    "intermediary_bank_3",
+    "recipient",
+    "recipient_bank",
+)
+
+
+@dataclass(frozen=True)
+class ClassificationContext:
+    """Prompt inputs shared by every batch of a file."""
+    system_prompt: str
+    prompt_cache_key: str
+
+
+def build_classification_context() -> ClassificationContext:
+    """
+    Resolve the system prompt and its cache key once for a file's batches.
+    
+    Every batch of the file is then sent with the same prompt, even if the
+    SQLite country list changes mid-run.
+    
+    Returns:
+        ClassificationContext for classify_batch
+    """
+    return ClassificationContext(
+        system_prompt=build_system_prompt(),
+        prompt_cache_key=system_prompt_cache_key(),
+    )
+
+
+@lru_cache(maxsize=4096)
+def match_auto_offshore_entity(name: str) -> Optional[str]:
+    """
+    Match a bank or counterparty name against the auto-offshore entity list.
+    
+    Memoized: bank names repeat heavily within a file and across batches.
+    
+    Args:
+        name: Bank or counterparty name from the transaction
+    
+    Returns:
+        Matched entity from AUTO_OFFSHORE_ENTITIES, or None
+    """
+    normalized = " ".join(name.upper().split())
+    for entity in AUTO_OFFSHORE_ENTITIES:
+        if entity in normalized:
+            return entity
+    return None
+
+
+def find_auto_offshore_entity(transaction_data: Dict[str, Any]) -> Optional[str]:
+    """
+    Find the first auto-offshore entity among a transaction's banks and counterparties.
+    
+    Args:
+        transaction_data: Normalized transaction dictionary
+    
+    Returns:
+        Matched entity from AUTO_OFFSHORE_ENTITIES, or None
+    """
+    for field in AUTO_OFFSHORE_FIELDS:
+        value = transaction_data.get(field)
+        if value:
+            entity = match_auto_offshore_entity(str(value))
+            if entity is not None:
+                return entity
+    return None
+
+
+def try_fast_path(transaction_data: Dict[str, Any]) -> Optional[OffshoreRiskResponse]:
+    """
+    Classify a transaction locally when a deterministic rule decides it.
+    
+    A bank or counterparty on the auto-offshore entity list is OFFSHORE_YES
+    with confidence 1.0 without web search (Rule 7 of the system prompt).
+    
+    Args:
+        transaction_data: Normalized transaction dictionary
+    
+    Returns:
+        OffshoreRiskResponse if decided locally, None if the LLM is needed
+    """
+    entity = find_auto_offshore_entity(transaction_data)
+    if entity is None:
+        return None
+    return OffshoreRiskResponse(
+        transaction_id=str(transaction_data.get("id", "")),
+        direction=transaction_data.get("direction", "incoming"),
+        amount_kzt=transaction_data.get("amount_kzt", 0.0),
+        classification=Classification(label="OFFSHORE_YES", confidence=1.0),
+        reasoning_short_ru=f"{entity} входит в список обязательных офшорных организаций.",
+        sources=[],
+    )
+
+
+def classification_cache_key(
+    transaction_data: Dict[str, Any],
+    context: ClassificationContext
+) -> str:
+    """
+    Build the classification cache key for a transaction.
+    
+    The key covers the model, the system prompt version, and exactly the
+    transaction fields shown to the LLM (not its ID or amount), so a changed
+    prompt or model invalidates old entries.
+    
+    Args:
+        transaction_data: Normalized transaction dictionary
+        context: Prompt context the transaction is classified with
+    
+    Returns:
+        Hex digest cache key
+    """
+    key_source = "\n".join((
+        settings.openai_model,
+        context.prompt_cache_key,
+        str(transaction_data.get("direction", "unknown")),
+        build_transaction_block(transaction_data),
+    ))
+    return hashlib.blake2b(key_source.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def _load_cached_response(
+    transaction_data: Dict[str, Any],
+    cache_key: str,
+    cached: Optional[str]
+) -> Optional[OffshoreRiskResponse]:
+    """Parse a cached classification and bind it to the given transaction."""
+    if cached is None:
+        return None
+    try:
+        response = OffshoreRiskResponse.model_validate_json(cached)
+    except ValidationError as e:
+        logger.warning(f"Discarding invalid cached classification {cache_key}: {e}")
+        return None
+    response.transaction_id = str(transaction_data.get("id", ""))
+    response.direction = transaction_data.get("direction", "incoming")
+    response.amount_kzt = transaction_data.get("amount_kzt", 0.0)
+    return response
+
 
 def classify_batch(
     transactions: List[Dict[str, Any]],
+    context: Optional[ClassificationContext] = None,
     temperature: float = 0.1
 ) -> List[OffshoreRiskResponse]:
     """
     Classify a batch of transactions for offshore risk using LLM.
     
+    With LLM_CACHE_ENABLED, previous LLM classifications are served from the
+    SQLite cache; only the remaining transactions are sent to the LLM in one
+    call. The OFFSHORE_FAST_PATH rules (see try_fast_path) are applied by the
+    caller before batching.
+    
     Args:
         transactions: List of normalized transaction dictionaries
+        context: Prompt context from build_classification_context; built on
+            demand when omitted
         temperature: LLM temperature (0.0-1.0)
     
     Returns:
@@ -34,51 +203,79 @@ def classify_batch(
     """
     if not transactions:
         return []
+
+    if context is None:
+        context = build_classification_context()
+
+    cache_keys: Dict[int, str] = {}
+    if settings.llm_cache_enabled:
+        cache_keys = {
+            i: classification_cache_key(txn, context) for i, txn in enumerate(transactions)
+        }
+        # One connection and lookup for the whole batch
+        cached = get_db().get_cached_classifications(
+            list(cache_keys.values()), settings.llm_cache_ttl_days
+        )
+        results: List[Optional[OffshoreRiskResponse]] = [
+            _load_cached_response(txn, cache_keys[i], cached.get(cache_keys[i]))
+            for i, txn in enumerate(transactions)
+        ]
+    else:
+        results = [None] * len(transactions)
+
+    pending = [i for i, res in enumerate(results) if res is None]
+    if len(pending) < len(transactions):
+        logger.info(
+            f"Resolved {len(transactions) - len(pending)}/{len(transactions)} "
+            f"transactions without LLM"
+        )
+
+    llm_results = _classify_with_llm([transactions[i] for i in pending], context, temperature)
+    new_entries = []
+    for i, res in zip(pending, llm_results):
+        results[i] = res
+        if i in cache_keys and res.llm_error is None:
+            new_entries.append(
+                (cache_keys[i], res.model_dump_json(exclude=CACHE_EXCLUDED_FIELDS))
+            )
+    if new_entries:
+        get_db().set_cached_classifications(new_entries)
+
+    return results
+
+
+def _classify_with_llm(
+    transactions: List[Dict[str, Any]],
+    context: ClassificationContext,
+    temperature: float
+) -> List[OffshoreRiskResponse]:
+    """Classify transactions with a single LLM call (with validation retries)."""
+    if not transactions:
+        return []
         
     logger.info(f"Classifying batch of {len(transactions)} transactions")
     
     try:
-        # Build prompts
-        system_prompt = build_system_prompt()
-        user_message = build_user_message(transactions)
-        
-        # Get LLM client
-        client = get_client()
+        response_map = _request_classifications(transactions, context, temperature)
 
-        # Retry loop for validation errors (malformed LLM responses)
-        batch_result = None
-        last_validation_error = None
-        
-        for attempt in range(MAX_VALIDATION_RETRIES):
-            # Call LLM
-            llm_response = client.call_with_structured_output(
-                system_prompt=system_prompt,
-                user_message=user_message,
-                response_schema=RESPONSE_SCHEMA,
-                temperature=temperature,
+        # The model occasionally drops items from large batches; give the
+        # missing subset one more, smaller call before marking them as errors
+        missing = [
+            txn for txn in transactions
+            if str(txn.get("id", "unknown")) not in response_map
+        ]
+        if missing:
+            logger.warning(
+                f"{len(missing)} of {len(transactions)} transactions missing from LLM response, retrying them"
             )
-            
-            # Validate response with pydantic
+            # Any failure here only affects the missing subset; keep the
+            # results the first call already returned
             try:
-                batch_result = BatchOffshoreRiskResponse(**llm_response)
-                break  # Success - exit retry loop
-            except ValidationError as e:
-                last_validation_error = e
-                if attempt < MAX_VALIDATION_RETRIES - 1:
-                    logger.warning(
-                        f"Validation failed (attempt {attempt + 1}/{MAX_VALIDATION_RETRIES}), retrying: {e}"
-                    )
-                    continue
-                # Final attempt failed - will be handled below
-        
-        # If all retries failed, raise the last validation error
-        if batch_result is None:
-            raise last_validation_error
+                response_map.update(_request_classifications(missing, context, temperature))
+            except Exception as e:
+                logger.warning(f"Retry for missing transactions failed: {e}")
         
         # Map results back to original transactions to ensure order/completeness
-        # Create a map of id -> response
-        response_map = {res.transaction_id: res for res in batch_result.results if res.transaction_id}
-        
         final_results = []
         for txn in transactions:
             txn_id = str(txn.get("id", "unknown"))
@@ -119,6 +316,69 @@ def classify_batch(
         return [create_error_response(t, f"Unexpected error: {str(e)}") for t in transactions]
 
 
+def _request_classifications(
+    transactions: List[Dict[str, Any]],
+    context: ClassificationContext,
+    temperature: float
+) -> Dict[str, OffshoreRiskResponse]:
+    """
+    Send one batch to the LLM and index the validated results by transaction ID.
+    
+    Args:
+        transactions: Normalized transactions to classify in one call
+        context: Prompt context shared by the file's batches
+        temperature: LLM temperature
+    
+    Returns:
+        Mapping of transaction ID to the model's classification
+    
+    Raises:
+        ValidationError: If every validation attempt fails
+        LLMError: If the API call fails
+    """
+    # Build the per-batch prompt; the system prompt comes from the context
+    user_message = build_user_message(transactions)
+    # Rule 7 matches need no web search; skip the tool when every transaction has one
+    enable_web_search = not all(find_auto_offshore_entity(txn) for txn in transactions)
+    
+    # Get LLM client
+    client = get_client()
+
+    # Retry loop for validation errors (malformed LLM responses)
+    batch_result = None
+    last_validation_error = None
+    
+    for attempt in range(MAX_VALIDATION_RETRIES):
+        # Call LLM
+        llm_response = client.call_with_structured_output(
+            system_prompt=context.system_prompt,
+            user_message=user_message,
+            response_schema=RESPONSE_SCHEMA,
+            temperature=temperature,
+            prompt_cache_key=context.prompt_cache_key,
+            enable_web_search=enable_web_search,
+        )
+        
+        # Validate response with pydantic
+        try:
+            batch_result = BatchOffshoreRiskResponse.model_validate(llm_response)
+            break  # Success - exit retry loop
+        except ValidationError as e:
+            last_validation_error = e
+            if attempt < MAX_VALIDATION_RETRIES - 1:
+                logger.warning(
+                    f"Validation failed (attempt {attempt + 1}/{MAX_VALIDATION_RETRIES}), retrying: {e}"
+                )
+                continue
+            # Final attempt failed - will be handled below
+    
+    # If all retries failed, raise the last validation error
+    if batch_result is None:
+        raise last_validation_error
+    
+    return {res.transaction_id: res for res in batch_result.results if res.transaction_id}
+
+
 def create_error_response(
     transaction_data: Dict[str, Any],
     error_msg: str
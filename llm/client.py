@@ -3,25 +3,39 @@ OpenAI Responses API client using direct REST API calls.
 Handles API calls with retries and structured output.
 """
 import json
+import logging
 import re
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from typing import Any, Dict, List, Optional
 
 import requests
 from requests.adapters import HTTPAdapter
 from tenacity import (
+    RetryCallState,
     retry,
     retry_if_exception_type,
     stop_after_attempt,
     wait_exponential,
+    wait_random,
 )
 
 from core.config import get_settings
-from core.exceptions import ConfigurationError, LLMError
-from core.logger import setup_logger
+from core.exceptions import ConfigurationError, LLMError, LLMTransientError
 
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# HTTP statuses worth retrying: request timeout, rate limit, and server-side errors
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+# Upper bound on a server-provided Retry-After hint, in seconds
+MAX_RETRY_AFTER_SECONDS = 60.0
+
+# Set by close_client(): interrupts retry backoff and rejects further calls
+_shutdown_event = threading.Event()
+
 # Static JSON schema for BatchOffshoreRiskResponse — built once at import time.
 RESPONSE_SCHEMA: Dict[str, Any] = {
     "type": "object",
@@ -105,6 +119,58 @@ def extract_json_from_text(content: str) -> str:
     return content
 
 
+def parse_retry_after(response: Optional[requests.Response]) -> Optional[float]:
+    """
+    Read the server's retry hint from a Responses API error response.
+
+    Supports OpenAI's `retry-after-ms` header and the standard `Retry-After`
+    header in both delta-seconds and HTTP-date forms.
+
+    Args:
+        response: HTTP response (may be None)
+
+    Returns:
+        Seconds to wait before retrying, or None if no usable hint is present
+    """
+    if response is None:
+        return None
+
+    retry_after_ms = response.headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+# Fallback backoff when the server gives no hint: exponential with jitter
+_default_wait = wait_exponential(multiplier=1, min=2, max=10) + wait_random(0, 1)
+
+
+def wait_for_retry(retry_state: RetryCallState) -> float:
+    """Tenacity wait strategy that honors Retry-After, else backs off exponentially."""
+    error = retry_state.outcome.exception() if retry_state.outcome else None
+    retry_after = getattr(error, "details", {}).get("retry_after")
+    if retry_after is not None:
+        return min(retry_after, MAX_RETRY_AFTER_SECONDS)
+    return _default_wait(retry_state)
+
+
 class OpenAIClientWrapper:
     """Wrapper for the OpenAI Responses API with retry logic."""
     
@@ -120,6 +186,17 @@ class OpenAIClientWrapper:
         self.api_key = settings.openai_api_key
         self.model = settings.openai_model
         self.timeout = settings.openai_timeout
+        self.web_search_tool = settings.openai_web_search_tool
+        self.reasoning_effort = settings.openai_reasoning_effort
+        self.max_output_tokens = settings.openai_max_output_tokens
+
+        # Static request parts, built once instead of on every call
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+        # GPT-5 models don't support temperature
+        self.supports_temperature = "gpt-5" not in self.model.lower()
 
         # Persistent session with connection pooling sized to concurrency limit
         pool_size = max(settings.max_concurrent_llm_calls, 5)
@@ -143,8 +220,9 @@ class OpenAIClientWrapper:
     
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((Exception,)),
+        wait=wait_for_retry,
+        retry=retry_if_exception_type(LLMTransientError),
+        sleep=_shutdown_event.wait,
         reraise=True
     )
     def call_with_structured_output(
@@ -153,6 +231,8 @@ class OpenAIClientWrapper:
         user_message: str,
         response_schema: Dict[str, Any],
         temperature: float = 0.2,
+        prompt_cache_key: Optional[str] = None,
+        enable_web_search: bool = True,
     ) -> Dict[str, Any]:
         """
         Call the OpenAI Responses API with structured output.
@@ -162,22 +242,26 @@ class OpenAIClientWrapper:
             user_message: User message with transaction data
             response_schema: JSON schema for structured output
             temperature: Model temperature (0.0-1.0)
+            prompt_cache_key: Optional key grouping requests that share the
+                same system prompt for server-side prompt caching
+            enable_web_search: Offer the configured web search tool to the model
         
         Returns:
             Parsed JSON response
         
         Raises:
-            LLMError: If API call fails after retries
+            LLMTransientError: If a retryable failure persists after retries
+            LLMError: If API call fails with a non-retryable error
         """
+        if _shutdown_event.is_set():
+            raise LLMError("Responses API client is shutting down")
+
         # Build request payload for the Responses API.
         payload = {
             "model": self.model,
             "instructions": system_prompt,
-            "reasoning": {"effort": "medium"},
+            "reasoning": {"effort": self.reasoning_effort},
             "input": user_message,
-            "include": ["web_search_call.action.sources"],
-            "tools": [{"type": "web_search"}],
-            "tool_choice": "auto",
             "text": {
                 "format": {
                     "type": "json_schema",
@@ -188,21 +272,26 @@ class OpenAIClientWrapper:
             }
         }
         
-        # Add temperature only for non-GPT-5 models (GPT-5 doesn't support temperature)
-        if "gpt-5" not in self.model.lower():
+        if enable_web_search:
+            payload["include"] = ["web_search_call.action.sources"]
+            payload["tools"] = [{"type": self.web_search_tool}]
+            payload["tool_choice"] = "auto"
+
+        if self.supports_temperature:
             payload["temperature"] = temperature
-        
-        # Build headers
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+
+        # Caps output (including reasoning tokens) to bound tail latency and cost
+        if self.max_output_tokens:
+            payload["max_output_tokens"] = self.max_output_tokens
+
+        if prompt_cache_key and settings.openai_prompt_cache:
+            payload["prompt_cache_key"] = prompt_cache_key
         
         try:
             # Make POST request via persistent session; headers passed per-request.
             response = self.session.post(
                 self.responses_url,
-                headers=headers,
+                headers=self.headers,
                 json=payload,
                 timeout=self.timeout
             )
@@ -210,11 +299,13 @@ class OpenAIClientWrapper:
             # Raise for HTTP errors (4xx, 5xx)
             response.raise_for_status()
             
-            logger.debug(
-                "Responses API status: %s, length: %s",
-                response.status_code,
-                len(response.text),
-            )
+            if logger.isEnabledFor(logging.DEBUG):
+                # response.text decodes the whole body; only pay for it when logged
+                logger.debug(
+                    "Responses API status: %s, length: %s",
+                    response.status_code,
+                    len(response.text),
+                )
 
             completion_data = response.json()
 
@@ -231,12 +322,18 @@ class OpenAIClientWrapper:
                     f"OpenAI API error: {error_detail.get('message', error_detail) if isinstance(error_detail, dict) else error_detail}"
                 )
 
+            # A truncated response (e.g. max_output_tokens reached) holds partial JSON
+            if completion_data.get("status") == "incomplete":
+                reason = (completion_data.get("incomplete_details") or {}).get("reason")
+                raise ValueError(f"Responses API returned an incomplete response: {reason}")
+
             content = self._extract_output_text(completion_data)
 
             if not content:
-                logger.error(f"Response keys: {list(completion_data.keys())}")
+                logger.error("Response keys: %s", list(completion_data.keys()))
                 logger.error(
-                    f"Full response (truncated): {json.dumps(completion_data, ensure_ascii=False, indent=2)[:2000]}"
+                    "Full response (truncated): %s",
+                    json.dumps(completion_data, ensure_ascii=False, indent=2)[:2000],
                 )
                 raise ValueError(
                     "Unexpected Responses API structure: could not find assistant output text"
@@ -259,7 +356,7 @@ class OpenAIClientWrapper:
                 usage = completion_data['usage']
                 input_tokens = usage.get('input_tokens', 'N/A')
                 output_tokens = usage.get('output_tokens', 'N/A')
-                logger.info(f"Token usage - Input: {input_tokens}, Output: {output_tokens}")
+                logger.info("Token usage - Input: %s, Output: %s", input_tokens, output_tokens)
             
             return result
 
@@ -267,48 +364,61 @@ class OpenAIClientWrapper:
             raise
         
         except requests.exceptions.Timeout as e:
-            logger.error(f"Responses API request timeout after {self.timeout}s: {e}")
-            raise LLMError(
+            logger.error("Responses API request timeout after %ss: %s", self.timeout, e)
+            raise LLMTransientError(
                 f"Responses API request timeout after {self.timeout}s",
                 details={"responses_url": self.responses_url, "timeout": self.timeout}
             )
         
         except requests.exceptions.HTTPError as e:
-            logger.error(f"Responses API HTTP error: {e}")
-            raise LLMError(
+            logger.error("Responses API HTTP error: %s", e)
+            status_code = getattr(e.response, "status_code", None)
+            error_cls = LLMTransientError if status_code in RETRYABLE_STATUS_CODES else LLMError
+            raise error_cls(
                 f"OpenAI API returned HTTP error: {e}",
                 details={
                     "responses_url": self.responses_url,
-                    "status_code": getattr(e.response, "status_code", None),
+                    "status_code": status_code,
                     "response_text": getattr(e.response, "text", None),
+                    "retry_after": parse_retry_after(e.response),
                 }
             )
         
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.ChunkedEncodingError,
+        ) as e:
+            logger.error("Responses API connection failed: %s", e)
+            raise LLMTransientError(
+                f"Failed to connect to OpenAI API: {str(e)}",
+                details={"responses_url": self.responses_url, "error": str(e)}
+            )
+        
         except requests.exceptions.RequestException as e:
-            logger.error(f"Responses API request failed: {e}")
+            logger.error("Responses API request failed: %s", e)
             raise LLMError(
                 f"Failed to connect to OpenAI API: {str(e)}",
                 details={"responses_url": self.responses_url, "error": str(e)}
             )
         
         except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse Responses API payload as JSON: {e}")
+            logger.error("Failed to parse Responses API payload as JSON: %s", e)
             raw_response = response.text if 'response' in locals() else "N/A"
-            logger.error(f"Raw response: {raw_response}")
+            logger.error("Raw response: %s", raw_response)
             raise LLMError(
                 f"OpenAI API returned invalid JSON: {e}",
                 details={"raw_response": raw_response}
             )
         
         except ValueError as e:
-            logger.error(f"Error parsing Responses API response: {e}")
+            logger.error("Error parsing Responses API response: %s", e)
             raise LLMError(
                 f"OpenAI API response parsing error: {str(e)}",
                 details={"error": str(e)}
             )
         
         except Exception as e:
-            logger.error(f"Unexpected error calling OpenAI API: {e}")
+            logger.error("Unexpected error calling OpenAI API: %s", e)
             raise LLMError(
                 f"Unexpected error calling OpenAI API: {str(e)}",
                 details={"model": self.model, "error": str(e)}
@@ -316,11 +426,17 @@ class OpenAIClientWrapper:
 
     @staticmethod
     def _extract_output_text(completion_data: Dict[str, Any]) -> Optional[str]:
-        """Extract the assistant output text from a Responses API payload."""
+        """
+        Extract the assistant output text from a Responses API payload.
+
+        Uses the top-level `output_text` aggregate when the endpoint provides
+        it. Otherwise scans output items from the end: the final answer is the
+        last assistant message, after any web_search_call items.
+        """
         if completion_data.get("output_text"):
             return completion_data["output_text"]
 
-        for item in completion_data.get("output", []):
+        for item in reversed(completion_data.get("output", [])):
             if item.get("type") != "message" or item.get("role") != "assistant":
                 continue
 
@@ -366,24 +482,53 @@ class OpenAIClientWrapper:
 
 # Singleton client instance
 _client: Optional[OpenAIClientWrapper] = None
+# Guards singleton creation: LLM calls run concurrently in executor threads
+_client_lock = threading.Lock()
 
 
 def get_client() -> OpenAIClientWrapper:
     """
     Get or create OpenAI client singleton.
 
+    Thread-safe: concurrent first calls share one client and one
+    connection pool instead of each building their own.
+
     Returns:
         OpenAI client wrapper instance
+
+    Raises:
+        LLMError: If close_client() has run and reset_client() has not
     """
     global _client
     if _client is None:
-        _client = OpenAIClientWrapper()
+        with _client_lock:
+            if _shutdown_event.is_set():
+                raise LLMError("Responses API client is shutting down")
+            if _client is None:
+                _client = OpenAIClientWrapper()
     return _client
 
 
+def reset_client() -> None:
+    """
+    Allow get_client() to create a client again after close_client().
+
+    Called on application startup so a re-entered lifespan can make calls.
+    """
+    with _client_lock:
+        _shutdown_event.clear()
+
+
 def close_client() -> None:
-    """Close the singleton client's HTTP session if it was initialized."""
+    """
+    Close the singleton client's HTTP session if it was initialized.
+
+    In-flight calls stop retrying: pending backoff sleeps are interrupted
+    and further attempts fail fast with LLMError.
+    """
     global _client
-    if _client is not None:
-        _client.close()
-        _client = None
+    with _client_lock:
+        _shutdown_event.set()
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -2,58 +2,37 @@
 System and user prompts for LLM offshore risk classification.
 Loads offshore jurisdictions from SQLite database and builds batch prompts.
 """
+import hashlib
+import logging
+import os
 from functools import lru_cache
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Tuple
 
 from core.db import get_db
-from core.logger import setup_logger
-
-logger = setup_logger(__name__)
-
-
-def load_offshore_list() -> str:
-    """
-    Load offshore countries list from SQLite database.
-    
-    Returns:
-        Formatted list as string for system prompt
-    """
-    try:
-        db = get_db()
-        countries = db.get_all_countries()
-        
-        if not countries:
-            logger.warning("No countries found in database")
-            return "No offshore countries loaded."
-        
-        logger.info(f"Loaded {len(countries)} offshore countries from DB")
-        return "\n".join([f"- {country}" for country in countries])
-    
-    except Exception as e:
-        logger.error(f"Failed to load offshore list: {e}", exc_info=True)
-        return "Error loading offshore list."
-
-
-@lru_cache(maxsize=1)
-def build_system_prompt() -> str:
-    """
-    Build the system prompt with embedded offshore jurisdictions list.
-
-    Structure (in order):
-      1. Role & task definition
-      2. Offshore list (reference data)
-      3. Classification labels (decision outcomes)
-      4. Evaluation scope (what to check)
-      5. Special rules (edge cases)
-      6. Step-by-step procedure (how to execute)
-      7. Examples (grouped by pattern)
-
-    Returns:
-        Complete system prompt string
-    """
-    offshore_list = load_offshore_list()
-
-    prompt = f"""<role>
+from core.exceptions import DataNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Mandatory auto-offshore banks and entities (Rule 7 of the system prompt).
+# Matched against bank and counterparty names by case-insensitive substring.
+AUTO_OFFSHORE_ENTITIES: Tuple[str, ...] = (
+    "OCBC WING HANG BANK (CHINA) LIMITED",
+    "THE BANK OF EAST ASIA (CHINA)",
+    "HSBC BANK (CHINA) COMPANY LIMITED",
+    "METROPOLITAN BANK AND TRUST COMPANY",
+    "NANYANG COMMERCIAL BANK (CHINA)",
+    "ASIAN DEVELOPMENT BANK",
+    "GULF INTERNATIONAL BANK (GIB) SAUDI ARABIA",
+    "ILLUMINA GLOBAL LTD",
+    "HARBOUR AND HILLS FINANCIAL SERVICE",
+    "SEA MEADOW HOUSE",
+)
+
+_AUTO_OFFSHORE_LIST = "\n".join(f"  - {entity}" for entity in AUTO_OFFSHORE_ENTITIES)
+
+# Static system prompt text around the offshore list; only the list is
+# rendered at runtime (see build_system_prompt for the section layout).
+_SYSTEM_PROMPT_PREFIX: str = """<role>
 You are a financial compliance analyst at a Kazakhstani bank.
 Task: classify each banking transaction as OFFSHORE_YES, OFFSHORE_NO, or OFFSHORE_SUSPECT based on whether ANY involved address, bank headquarters, entity headquarters, or country code is connected to an offshore jurisdiction from the list below.
 </role>
@@ -65,7 +44,9 @@ If a country or territory appears here — even if you personally believe it is
 Do NOT apply your own judgment about whether a country is offshore. This list is the ONLY authority.
 Match by meaning, not exact spelling (e.g., "Sri Lanka" = "Шри-Ланка", "Montenegro" = "Черногория").
 
-{offshore_list}
+"""
+
+_SYSTEM_PROMPT_SUFFIX: str = f"""
 </offshore_list>
 
 <classification_labels>
@@ -171,16 +152,7 @@ If ANY bank or counterparty in the transaction matches any entity below (by subs
 No web search is needed. In reasoning, state which entity matched the mandatory offshore entity list.
 
 Auto-offshore entity list:
-  - OCBC WING HANG BANK (CHINA) LIMITED
-  - THE BANK OF EAST ASIA (CHINA)
-  - HSBC BANK (CHINA) COMPANY LIMITED
-  - METROPOLITAN BANK AND TRUST COMPANY
-  - NANYANG COMMERCIAL BANK (CHINA)
-  - ASIAN DEVELOPMENT BANK
-  - GULF INTERNATIONAL BANK (GIB) SAUDI ARABIA
-  - ILLUMINA GLOBAL LTD
-  - HARBOUR AND HILLS FINANCIAL SERVICE
-  - SEA MEADOW HOUSE
+{_AUTO_OFFSHORE_LIST}
 </special_rules>
 
 <procedure>
@@ -276,9 +248,102 @@ Bank "OCBC WING HANG BANK (CHINA) LIMITED" → matches auto-offshore list → OF
 Bank "HSBC BANK (CHINA) COMPANY LIMITED" → matches auto-offshore list → OFFSHORE_YES (confidence 1.0)
 Counterparty "ILLUMINA GLOBAL LTD" → matches auto-offshore list → OFFSHORE_YES (confidence 1.0)
 </examples>"""
+
+
+def _database_mtime() -> float:
+    """Return the SQLite database modification time (0.0 if unavailable)."""
+    try:
+        return os.stat(get_db().db_path).st_mtime
+    except OSError:
+        return 0.0
+
+
+@lru_cache(maxsize=1)
+def _load_offshore_list(db_mtime: float) -> str:
+    """
+    Load and format offshore countries for a given database version.
+    
+    Keyed on the database mtime so edits to the list are picked up.
+    Raises instead of returning a fallback so failures are never cached.
+    """
+    countries = get_db().get_all_countries()
+    if not countries:
+        raise DataNotFoundError("No countries found in database")
+    logger.info(f"Loaded {len(countries)} offshore countries from DB")
+    return "\n".join(f"- {country}" for country in countries)
+
+
+def load_offshore_list() -> str:
+    """
+    Load offshore countries list from SQLite database.
+    
+    Returns:
+        Formatted list as string for system prompt
+    """
+    try:
+        return _load_offshore_list(_database_mtime())
+    except DataNotFoundError:
+        logger.warning("No countries found in database")
+        return "No offshore countries loaded."
+    except Exception as e:
+        logger.error(f"Failed to load offshore list: {e}", exc_info=True)
+        return "Error loading offshore list."
+
+
+def build_system_prompt() -> str:
+    """
+    Build the system prompt with embedded offshore jurisdictions list.
+
+    The rendered prompt is cached per offshore list, so repeated calls
+    return the same string object until the SQLite list changes.
+
+    Structure (in order):
+      1. Role & task definition
+      2. Offshore list (reference data)
+      3. Classification labels (decision outcomes)
+      4. Evaluation scope (what to check)
+      5. Special rules (edge cases)
+      6. Step-by-step procedure (how to execute)
+      7. Examples (grouped by pattern)
+
+    Returns:
+        Complete system prompt string
+    """
+    return _render_system_prompt(load_offshore_list())
+
+
+@lru_cache(maxsize=1)
+def _render_system_prompt(offshore_list: str) -> str:
+    """Render the full system prompt around a formatted offshore list."""
+    prompt = _SYSTEM_PROMPT_PREFIX + offshore_list + _SYSTEM_PROMPT_SUFFIX
+    # Shared preamble paid by every batch; useful when tuning BATCH_SIZE
+    logger.info(
+        f"System prompt rendered: {len(prompt.encode('utf-8'))} bytes "
+        f"(offshore list {len(offshore_list.encode('utf-8'))} bytes)"
+    )
     return prompt
 
 
+def system_prompt_cache_key() -> str:
+    """
+    Build a stable prompt cache key for the current system prompt.
+
+    The key changes only when the system prompt text changes, so requests
+    sharing the same instructions are routed to the same server-side cache.
+
+    Returns:
+        Prompt cache key string
+    """
+    return _prompt_cache_key(build_system_prompt())
+
+
+@lru_cache(maxsize=1)
+def _prompt_cache_key(system_prompt: str) -> str:
+    """Hash a system prompt into a prompt cache key."""
+    digest = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+    return f"offshore-system-{digest}"
+
+
 def build_user_message(transactions: List[Dict[str, Any]]) -> str:
     """
     Build user message with a batch of transactions.
@@ -302,21 +367,30 @@ def build_user_message(transactions: List[Dict[str, Any]]) -> str:
     for i, txn in enumerate(transactions, 1):
         txn_id = txn.get("id", "unknown")
         direction = txn.get("direction", "unknown")
-        client_category = txn.get("client_category", "")
 
-        txn_block = [f"--- Transaction #{i} (ID: {txn_id}, Direction: {direction}) ---"]
-
-        if direction == "incoming":
-            txn_block.append(_build_incoming_block(txn, client_category))
-        else:
-            txn_block.append(_build_outgoing_block(txn, client_category))
-
-        message_parts.append("\n".join(txn_block))
+        message_parts.append(
+            f"--- Transaction #{i} (ID: {txn_id}, Direction: {direction}) ---\n"
+            + build_transaction_block(txn)
+        )
         message_parts.append("")  # blank line separator
 
     return "\n".join(message_parts)
 
 
+def build_transaction_block(txn: Dict[str, Any]) -> str:
+    """
+    Build the field block the LLM sees for a single transaction.
+
+    Args:
+        txn: Normalized transaction dictionary
+
+    Returns:
+        Field block (sections A-D) without the transaction header line
+    """
+    builder = _BLOCK_BUILDERS.get(txn.get("direction", "unknown"), _build_outgoing_block)
+    return builder(txn, txn.get("client_category", ""))
+
+
 def _build_incoming_block(txn: Dict[str, Any], client_category: str) -> str:
     """Build the field block for an incoming transaction."""
     lines: List[str] = []
@@ -365,14 +439,19 @@ def _build_incoming_block(txn: Dict[str, Any], client_category: str) -> str:
     correspondent_address = txn.get("payer_correspondent_address", "")
 
     lines.append("[B] Bank Information:")
-    lines.append(f"  Payer Bank: {bank} → VERIFY HQ LOCATION")
-    lines.append(f"  Payer Bank SWIFT: {swift}")
-    lines.append(f"  Payer Bank Address: {bank_address_complete}")
+    if bank:
+        lines.append(f"  Payer Bank: {bank} → VERIFY HQ LOCATION")
+    if swift:
+        lines.append(f"  Payer Bank SWIFT: {swift}")
+    if bank_address_complete:
+        lines.append(f"  Payer Bank Address: {bank_address_complete}")
 
     if correspondent_name:
         lines.append(f"  Correspondent Bank: {correspondent_name} → VERIFY HQ LOCATION")
-        lines.append(f"  Correspondent Bank SWIFT: {correspondent_swift}")
-        lines.append(f"  Correspondent Bank Address: {correspondent_address}")
+        if correspondent_swift:
+            lines.append(f"  Correspondent Bank SWIFT: {correspondent_swift}")
+        if correspondent_address:
+            lines.append(f"  Correspondent Bank Address: {correspondent_address}")
 
     for idx in (1, 2, 3):
         intermediary = txn.get(f"intermediary_bank_{idx}", "")
@@ -432,9 +511,12 @@ def _build_outgoing_block(txn: Dict[str, Any], client_category: str) -> str:
     ])
 
     lines.append("[B] Bank Information:")
-    lines.append(f"  Recipient Bank: {bank} → VERIFY HQ LOCATION")
-    lines.append(f"  Recipient Bank SWIFT: {swift}")
-    lines.append(f"  Recipient Bank Address: {bank_address_complete}")
+    if bank:
+        lines.append(f"  Recipient Bank: {bank} → VERIFY HQ LOCATION")
+    if swift:
+        lines.append(f"  Recipient Bank SWIFT: {swift}")
+    if bank_address_complete:
+        lines.append(f"  Recipient Bank Address: {bank_address_complete}")
 
     # --- C. Country/citizenship codes ---
     country_residence = txn.get("country_residence", "")
@@ -456,6 +538,13 @@ def _build_outgoing_block(txn: Dict[str, Any], client_category: str) -> str:
     return "\n".join(lines)
 
 
+# Field block builder per direction; anything that is not incoming is laid out as outgoing
+_BLOCK_BUILDERS: Dict[str, Callable[[Dict[str, Any], str], str]] = {
+    "incoming": _build_incoming_block,
+    "outgoing": _build_outgoing_block,
+}
+
+
 def _join(parts: List[str]) -> str:
     """Join non-empty string parts with ', '."""
     return ", ".join(p for p in parts if p)
@@ -4,20 +4,26 @@ Main entry point for the offshore risk detection application.
 This module initializes the application, loads configuration,
 and starts the FastAPI server.
 """
+import logging
 import sys
 
-from core.config import get_settings
-from core.exceptions import ConfigurationError
-from core.logger import setup_logger
-
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
 
 
 def main():
     """Main application entry point."""
+    # Imported here so importing this module stays cheap for tooling
+    from core.config import get_settings
+    from core.exceptions import ConfigurationError
+    from core.logger import configure_logging
+
+    # Env/default level until settings are validated
+    configure_logging()
+
     try:
         # Load and validate configuration
         settings = get_settings()
+        configure_logging(settings.log_level)
         
         import uvicorn
         from app.api import app
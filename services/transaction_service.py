@@ -5,22 +5,35 @@ Encapsulates business logic for processing transactions through
 the offshore risk detection pipeline.
 """
 import asyncio
+import contextlib
+import logging
+import math
 import time
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Dict, List, Optional
+from itertools import chain
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Set
 
 from core.config import get_settings
 from core.exceptions import FileProcessingError
-from core.exporters import create_output_filename, export_to_excel
-from core.logger import setup_logger
-from core.normalize import filter_by_threshold, filter_by_payment_status, normalize_transaction
+from core.exporters import STREAMING_EXPORT_MIN_ROWS, create_output_filename, export_to_excel
+from core.normalize import filter_by_threshold, filter_by_payment_status, normalize_dataframe
 from core.parsing import parse_excel_file, validate_dataframe
 from core.pg import get_pg_pool
 from core.pg_logger import log_batch
 from core.schema import OffshoreRiskResponse
-from llm.classify import classify_batch, create_error_response
+from llm.classify import (
+    ClassificationContext,
+    build_classification_context,
+    classify_batch,
+    create_error_response,
+    try_fast_path,
+)
 
-logger = setup_logger(__name__)
+logger = logging.getLogger(__name__)
+
+_get_label = attrgetter("classification.label")
 
 
 class TransactionService:
@@ -29,56 +42,141 @@ class TransactionService:
     def __init__(self):
         """Initialize transaction service."""
         self.settings = get_settings()
+        # Settings are fixed for the process; keep plain copies for the batch path
+        self._batch_size = self.settings.batch_size
+        self._adaptive_batch_size = self.settings.adaptive_batch_size
+        self._max_concurrent = self.settings.max_concurrent_llm_calls
+        self._fast_path = self.settings.offshore_fast_path
+        self._threshold = self.settings.amount_threshold_kzt
+        self._temp_path = self.settings.temp_storage_path
+        # Dedicated pool for the blocking LLM calls; bounds them process-wide
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._max_concurrent,
+            thread_name_prefix="llm",
+        )
+        # Chunk tasks scheduled on the pool by all running jobs/directions
+        self._batches_in_flight = 0
+    
+    def close(self) -> None:
+        """Shut down the LLM thread pool, dropping batches that have not started."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _batch_done(self, _task: asyncio.Task) -> None:
+        """Release a pool slot claimed by a scheduled chunk task."""
+        self._batches_in_flight -= 1
     
     async def process_transaction_batch(
         self,
         transactions: List[Dict[str, Any]],
-        semaphore: asyncio.Semaphore,
         job_id: Optional[str] = None,
         direction: Optional[str] = None,
         original_filename: Optional[str] = None,
-        executor: Optional[ThreadPoolExecutor] = None,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        context: Optional[ClassificationContext] = None,
     ) -> List[OffshoreRiskResponse]:
         """
         Process all transactions by chunking them into batches.
         Logs each completed batch to PostgreSQL progressively.
 
+        With OFFSHORE_FAST_PATH enabled, transactions decided by local rules
+        are resolved up front so the LLM batches only carry the rest.
+
         Args:
             transactions: List of normalized transaction dictionaries
-            semaphore: Asyncio semaphore for concurrency control
             job_id: UUID of the processing job (for DB logging)
             direction: "incoming" or "outgoing" (for DB logging)
             original_filename: Source Excel filename (for DB logging)
-            executor: Optional ThreadPoolExecutor for LLM calls
+            semaphore: Optional extra concurrency limit; LLM calls are already
+                bounded by the service thread pool
+            context: Prompt context shared by all batches; built here if omitted
 
         Returns:
             List of classification responses
         """
         job_start = time.monotonic()
-        total = len(transactions)
-        batch_size = self.settings.batch_size
         pg_pool = get_pg_pool()
+        if context is None:
+            context = build_classification_context()
+
+        # Resolve fast-path transactions before chunking so batches stay full
+        resolved: List[Optional[OffshoreRiskResponse]] = [None] * len(transactions)
+        if self._fast_path:
+            for i, txn in enumerate(transactions):
+                resolved[i] = try_fast_path(txn)
+        pending_idx = [i for i, res in enumerate(resolved) if res is None]
+
+        if len(pending_idx) < len(transactions):
+            fast_txns = [txn for txn, res in zip(transactions, resolved) if res is not None]
+            fast_results = [res for res in resolved if res is not None]
+            logger.info(
+                f"Fast path resolved {len(fast_txns)}/{len(transactions)} transactions without LLM"
+            )
+            if pg_pool is not None and job_id:
+                try:
+                    await log_batch(
+                        pool=pg_pool,
+                        job_id=job_id,
+                        direction=direction or "unknown",
+                        original_filename=original_filename,
+                        transactions=fast_txns,
+                        responses=fast_results,
+                    )
+                except Exception as db_err:
+                    logger.warning(f"Fast path DB log failed (non-fatal): {db_err}")
+            transactions = [transactions[i] for i in pending_idx]
+
+        total = len(transactions)
+        if total == 0:
+            logger.info(f"Job summary [{direction}]: all transactions resolved without LLM")
+            return [res for res in resolved if res is not None]
 
-        # Create chunks
-        chunks = [transactions[i:i + batch_size] for i in range(0, total, batch_size)]
-        logger.info(f"Split {total} transactions into {len(chunks)} batches (size={batch_size})")
+        # Pool slots not already claimed by other runs (e.g. the other direction)
+        free_slots = max(1, self._max_concurrent - self._batches_in_flight)
+        batch_size = self._batch_size
+        if self._adaptive_batch_size:
+            # BATCH_SIZE is an upper bound: small jobs are split across the
+            # free slots instead of a few full batches running serially
+            batch_size = max(1, min(self._batch_size, math.ceil(total / free_slots)))
+            if batch_size < self._batch_size:
+                logger.info(
+                    f"Reduced batch size {self._batch_size} -> {batch_size} "
+                    f"to use {free_slots} free LLM slots"
+                )
+
+        # Create chunks lazily; each slice is only built when it is scheduled
+        chunk_count = math.ceil(total / batch_size)
+        if chunk_count < free_slots and batch_size > 1:
+            logger.warning(
+                f"Config may not saturate LLM: {chunk_count} batches for {free_slots} free slots; "
+                f"lower BATCH_SIZE or enable ADAPTIVE_BATCH_SIZE"
+            )
+        chunks = (transactions[i:i + batch_size] for i in range(0, total, batch_size))
+        logger.info(f"Split {total} transactions into {chunk_count} batches (size={batch_size})")
 
-        all_results = []
         completed_batches = [0]
+        loop = asyncio.get_running_loop()
 
-        async def process_chunk(chunk: List[Dict[str, Any]]) -> List[OffshoreRiskResponse]:
+        async def process_chunk(index: int, chunk: List[Dict[str, Any]]) -> List[OffshoreRiskResponse]:
             batch_start = time.monotonic()
-            async with semaphore:
-                loop = asyncio.get_running_loop()
-                llm_start = time.monotonic()
-                # Run sync LLM call in executor; semaphore released after this block
-                results = await loop.run_in_executor(executor, classify_batch, chunk)
-                llm_ms = (time.monotonic() - llm_start) * 1000
+            llm_start = batch_start
+            try:
+                async with semaphore if semaphore is not None else contextlib.nullcontext():
+                    llm_start = time.monotonic()
+                    # Run sync LLM call in executor; pool workers bound concurrency
+                    results = await loop.run_in_executor(self._executor, classify_batch, chunk, context)
+            except Exception as e:
+                # A failed chunk becomes error rows instead of failing the job
+                logger.error(f"Batch {index} failed completely: {e}")
+                results = [
+                    create_error_response(txn, f"Batch processing failed: {str(e)}")
+                    for txn in chunk
+                ]
+            llm_ms = (time.monotonic() - llm_start) * 1000
 
-            # Semaphore released — DB logging outside critical section
+            # DB logging outside the LLM slot
             completed_batches[0] += 1
             batch_num = completed_batches[0]
-            logger.info(f"Processed batch {batch_num}/{len(chunks)} [llm={llm_ms:.0f}ms]")
+            logger.info(f"Processed batch {batch_num}/{chunk_count} [llm={llm_ms:.0f}ms]")
 
             db_ms = 0.0
             if pg_pool is not None and job_id:
@@ -103,38 +201,36 @@ class TransactionService:
             )
             return results
         
-        # Process chunks concurrently (limited by semaphore)
-        tasks = [process_chunk(chunk) for chunk in chunks]
-        chunk_results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Process chunks concurrently, keeping at most one pool's worth in flight
+        # so large files do not queue every batch up front
+        chunk_results: List[List[OffshoreRiskResponse]] = [[] for _ in range(chunk_count)]
+        in_flight: Dict[asyncio.Task, int] = {}
 
-        # Flatten results and handle errors
-        for i, result in enumerate(chunk_results):
-            if isinstance(result, Exception):
-                logger.error(f"Batch {i} failed completely: {result}")
-                chunk_txns = chunks[i]
-                error_responses = [
-                    create_error_response(txn, f"Batch processing failed: {str(result)}")
-                    for txn in chunk_txns
-                ]
-                all_results.extend(error_responses)
+        def collect(done: Set[asyncio.Task]) -> None:
+            for task in done:
+                chunk_results[in_flight.pop(task)] = task.result()
 
-                # Log error responses to PostgreSQL
-                if pg_pool is not None and job_id:
-                    try:
-                        await log_batch(
-                            pool=pg_pool,
-                            job_id=job_id,
-                            direction=direction or "unknown",
-                            original_filename=original_filename,
-                            transactions=chunk_txns,
-                            responses=error_responses,
-                        )
-                    except Exception as db_err:
-                        logger.warning(f"Error batch DB log failed (non-fatal): {db_err}")
-            elif isinstance(result, list):
-                all_results.extend(result)
-            else:
-                logger.error(f"Unexpected result type for batch {i}: {type(result)}")
+        try:
+            for index, chunk in enumerate(chunks):
+                if len(in_flight) >= self._max_concurrent:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    collect(done)
+                task = asyncio.create_task(process_chunk(index, chunk))
+                self._batches_in_flight += 1
+                task.add_done_callback(self._batch_done)
+                in_flight[task] = index
+            if in_flight:
+                done, _ = await asyncio.wait(in_flight)
+                collect(done)
+        finally:
+            # Job cancelled: stop batches that are still running or queued
+            for task in in_flight:
+                task.cancel()
+
+        # Put LLM results back in input order around the fast-path results
+        for i, result in zip(pending_idx, chain.from_iterable(chunk_results)):
+            resolved[i] = result
+        all_results = [res for res in resolved if res is not None]
 
         total_ms = (time.monotonic() - job_start) * 1000
         rows_per_sec = len(all_results) / (total_ms / 1000) if total_ms > 0 else 0
@@ -155,11 +251,7 @@ class TransactionService:
         Returns:
             Dictionary with counts per classification label
         """
-        classification_counts = {}
-        for resp in responses:
-            label = resp.classification.label
-            classification_counts[label] = classification_counts.get(label, 0) + 1
-        return classification_counts
+        return dict(Counter(map(_get_label, responses)))
     
     async def process_file(
         self,
@@ -168,7 +260,6 @@ class TransactionService:
         job_id: Optional[str] = None,
         original_filename: Optional[str] = None,
         semaphore: Optional[asyncio.Semaphore] = None,
-        executor: Optional[ThreadPoolExecutor] = None,
     ) -> Dict[str, Any]:
         """
         Process a single Excel file through the full pipeline.
@@ -199,46 +290,49 @@ class TransactionService:
             if direction == "outgoing":
                 df_filtered = filter_by_payment_status(df_filtered)
                 logger.info(f"After status filter: {len(df_filtered)} transactions")
+
+            # Contiguous index for normalization and positional export alignment
+            df_filtered = df_filtered.reset_index(drop=True)
             
             if len(df_filtered) == 0:
                 logger.warning("No transactions meet the threshold criteria")
                 return {
                     "output_path": None,
                     "stats": {**stats, "filtered_count": 0, "processed_count": 0},
-                    "error": f"No transactions meet the {self.settings.amount_threshold_kzt:,.0f} KZT threshold"
+                    "error": f"No transactions meet the {self._threshold:,.0f} KZT threshold"
                 }
             
-            # 3. Prepare transactions (normalize on the fly)
-            transactions = []
-            for idx, row in df_filtered.iterrows():
-                # normalize_transaction now re-calculates amounts cleanly
-                txn = normalize_transaction(row, direction)
-                transactions.append(txn)
+            # 3. Prepare transactions (column-wise, same output as normalize_transaction)
+            transactions = normalize_dataframe(df_filtered, direction)
             
             logger.info(f"Prepared {len(transactions)} transactions for batch processing")
             
             # 4. Classify with LLM (batch processing)
             logger.info("Starting LLM batch classification...")
 
-            if semaphore is None:
-                semaphore = asyncio.Semaphore(self.settings.max_concurrent_llm_calls)
+            # Resolve the system prompt once; every batch of this file reuses it
+            context = build_classification_context()
 
             responses = await self.process_transaction_batch(
-                transactions, semaphore,
+                transactions,
                 job_id=job_id,
                 direction=direction,
                 original_filename=original_filename,
-                executor=executor,
+                semaphore=semaphore,
+                context=context,
             )
             
             logger.info(f"Completed LLM classification for {len(responses)}/{len(transactions)} transactions")
             
             # 5. Export to Excel
             sheet_name = "Входящие операции" if direction == "incoming" else "Исходящие операции"
-            output_path = create_output_filename(direction, self.settings.temp_storage_path)
+            output_path = create_output_filename(direction, self._temp_path)
             
             # export_to_excel now receives clean df without internal columns
-            export_to_excel(df_filtered, responses, output_path, sheet_name)
+            export_to_excel(
+                df_filtered, responses, output_path, sheet_name,
+                streaming=len(df_filtered) > STREAMING_EXPORT_MIN_ROWS,
+            )
             
             # Build statistics
             classification_counts = self.build_classification_statistics(responses)